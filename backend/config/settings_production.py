@@ -3,6 +3,7 @@ Production settings for NCLEX Website
 """
 import os
 from pathlib import Path
+from celery.schedules import crontab
 from .settings import *
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -40,6 +41,9 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests/commands instead of reconnecting each time
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -130,6 +134,12 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'generate-daily-payment-stats': {
+        'task': 'payments.tasks.generate_daily_payment_stats',
+        'schedule': crontab(hour=0, minute=5),
+    },
+}
 
 # Rate Limiting
 RATELIMIT_USE_CACHE = 'default'
@@ -1,10 +1,14 @@
 # payments/management/commands/cleanup_expired_payments.py
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from payments.models import Payment
 from courses.models import CourseEnrollment
 
+# Rows touched per UPDATE/DELETE so a large backlog never runs as one long transaction
+BATCH_SIZE = 5000
+
 class Command(BaseCommand):
     help = 'Clean up expired pending payments'
     
@@ -36,7 +40,7 @@ class Command(BaseCommand):
             # Also find related enrollments
             expired_enrollments = CourseEnrollment.objects.filter(
                 payment_status='pending',
-                created_at__lt=expiry_time
+                enrolled_at__lt=expiry_time
             )
             
             if options['dry_run']:
@@ -47,25 +51,41 @@ class Command(BaseCommand):
                 self.stdout.write(f"Would expire {expired_payments.count()} payments")
                 self.stdout.write(f"Would cancel {expired_enrollments.count()} enrollments")
                 
-                for payment in expired_payments[:10]:  # Show first 10
+                # Show first 10 as plain rows - no model instances needed for display
+                sample = expired_payments.values('reference', 'user__email', 'course__title')[:10]
+                for payment in sample:
                     self.stdout.write(
-                        f"  Payment: {payment.reference} - {payment.user.email} - {payment.course.title}"
+                        f"  Payment: {payment['reference']} - {payment['user__email']} - {payment['course__title']}"
                     )
                 
                 return
             
-            # Actually clean up
-            expired_count = expired_payments.count()
-            enrollment_count = expired_enrollments.count()
-            
-            # Mark payments as cancelled
-            expired_payments.update(
-                status='cancelled',
-                failure_reason='Payment expired - not completed within time limit'
-            )
+            # Actually clean up, one primary-key batch per transaction
+            expired_count = 0
+            while True:
+                with transaction.atomic():
+                    batch_ids = list(
+                        expired_payments.order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+                    )
+                    if not batch_ids:
+                        break
+                    # Mark payments as cancelled
+                    expired_count += Payment.objects.filter(pk__in=batch_ids).update(
+                        status='cancelled',
+                        failure_reason='Payment expired - not completed within time limit'
+                    )
             
-            # Cancel related enrollments
-            expired_enrollments.delete()  # Or update status if you want to keep records
+            enrollment_count = 0
+            while True:
+                with transaction.atomic():
+                    batch_ids = list(
+                        expired_enrollments.order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+                    )
+                    if not batch_ids:
+                        break
+                    # Cancel related enrollments
+                    CourseEnrollment.objects.filter(pk__in=batch_ids).delete()  # Or update status if you want to keep records
+                    enrollment_count += len(batch_ids)
             
             self.stdout.write(
                 self.style.SUCCESS(
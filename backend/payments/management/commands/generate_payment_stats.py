@@ -5,6 +5,15 @@ from datetime import timedelta
 from payments.models import Payment, PaymentStat
 from courses.models import CourseEnrollment
 from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+from collections import defaultdict
+
+STAT_FIELDS = [
+    'total_transactions', 'successful_transactions', 'failed_transactions',
+    'ngn_revenue', 'usd_revenue', 'total_revenue_ngn',
+    'total_gateway_fees', 'total_platform_fees', 'net_revenue',
+    'course_enrollments',
+]
 
 class Command(BaseCommand):
     help = 'Generate daily payment statistics'
@@ -33,50 +42,89 @@ class Command(BaseCommand):
                 yesterday = timezone.now().date() - timedelta(days=1)
                 dates_to_process = [yesterday - timedelta(days=i) for i in range(options['days'])]
             
+            range_start, range_end = min(dates_to_process), max(dates_to_process)
+            self.stdout.write(f"Generating stats for {range_start} to {range_end}")
+            
+            # Completed payments grouped by day and currency, in one query
+            completed_by_day = defaultdict(lambda: {
+                'successful': 0, 'ngn_revenue': 0, 'usd_revenue': 0,
+                'gateway_fees': 0, 'platform_fees': 0,
+            })
+            completed_rows = Payment.objects.filter(
+                status='completed',
+                paid_at__date__gte=range_start,
+                paid_at__date__lte=range_end
+            ).annotate(day=TruncDate('paid_at')).values('day', 'currency').annotate(
+                revenue=Sum('amount'),
+                gateway_fees=Sum('gateway_fee'),
+                platform_fees=Sum('platform_fee'),
+                count=Count('id')
+            ).order_by()
+            for row in completed_rows:
+                day = completed_by_day[row['day']]
+                day['successful'] += row['count']
+                day['gateway_fees'] += row['gateway_fees'] or 0
+                day['platform_fees'] += row['platform_fees'] or 0
+                if row['currency'] == 'NGN':
+                    day['ngn_revenue'] += row['revenue'] or 0
+                elif row['currency'] == 'USD':
+                    day['usd_revenue'] += row['revenue'] or 0
+            
+            failed_by_day = dict(
+                Payment.objects.filter(
+                    status='failed',
+                    failed_at__date__gte=range_start,
+                    failed_at__date__lte=range_end
+                ).annotate(day=TruncDate('failed_at')).values('day').annotate(
+                    count=Count('id')
+                ).order_by().values_list('day', 'count')
+            )
+            
+            enrollments_by_day = dict(
+                CourseEnrollment.objects.filter(
+                    payment_status='completed',
+                    enrolled_at__date__gte=range_start,
+                    enrolled_at__date__lte=range_end
+                ).annotate(day=TruncDate('enrolled_at')).values('day').annotate(
+                    count=Count('id')
+                ).order_by().values_list('day', 'count')
+            )
+            
+            stat_objs = []
             for date in dates_to_process:
-                self.stdout.write(f"Generating stats for {date}")
-                
-                # Get payments for this date
-                payments = Payment.objects.filter(paid_at__date=date, status='completed')
+                totals = completed_by_day[date]
                 
                 # Calculate stats
                 stats = {
-                    'total_transactions': payments.count(),
-                    'successful_transactions': payments.count(),
-                    'failed_transactions': Payment.objects.filter(
-                        failed_at__date=date, status='failed'
-                    ).count(),
-                    'ngn_revenue': payments.filter(currency='NGN').aggregate(
-                        total=Sum('amount')
-                    )['total'] or 0,
-                    'usd_revenue': payments.filter(currency='USD').aggregate(
-                        total=Sum('amount')
-                    )['total'] or 0,
-                    'total_gateway_fees': payments.aggregate(
-                        total=Sum('gateway_fee')
-                    )['total'] or 0,
-                    'total_platform_fees': payments.aggregate(
-                        total=Sum('platform_fee')
-                    )['total'] or 0,
-                    'course_enrollments': CourseEnrollment.objects.filter(
-                        enrolled_at__date=date, payment_status='completed'
-                    ).count()
+                    'total_transactions': totals['successful'],
+                    'successful_transactions': totals['successful'],
+                    'failed_transactions': failed_by_day.get(date, 0),
+                    'ngn_revenue': totals['ngn_revenue'],
+                    'usd_revenue': totals['usd_revenue'],
+                    'total_gateway_fees': totals['gateway_fees'],
+                    'total_platform_fees': totals['platform_fees'],
+                    'course_enrollments': enrollments_by_day.get(date, 0)
                 }
                 
                 # Calculate net revenue
                 stats['net_revenue'] = stats['ngn_revenue'] + stats['usd_revenue'] - stats['total_gateway_fees']
                 stats['total_revenue_ngn'] = stats['ngn_revenue'] + (stats['usd_revenue'] * 1600)  # Rough conversion
                 
-                # Create or update stat record
-                stat, created = PaymentStat.objects.update_or_create(
-                    date=date,
-                    defaults=stats
-                )
-                
+                stat_objs.append(PaymentStat(date=date, **stats))
+            
+            # Create or update every stat record in a single upsert
+            PaymentStat.objects.bulk_create(
+                stat_objs,
+                update_conflicts=True,
+                unique_fields=['date'],
+                update_fields=STAT_FIELDS + ['updated_at'],
+            )
+            
+            for stat in stat_objs:
                 self.stdout.write(
                     self.style.SUCCESS(
-                        f"{'Created' if created else 'Updated'} stats for {date}: "
-                        f"₦{stats['ngn_revenue']:,.2f} revenue, {stats['total_transactions']} transactions"
+                        f"Saved stats for {stat.date}: "
+                        f"₦{stat.ngn_revenue:,.2f} revenue, {stat.total_transactions} transactions"
                     )
                 )
         
@@ -1,15 +1,26 @@
 from django.core.management.base import BaseCommand
-from django.test import Client
-from django.urls import reverse
-from payments.models import PaymentGateway, Payment
+from django.test import RequestFactory
+from django.urls import reverse, resolve, Resolver404
+from payments.models import PaymentGateway
+from payments import payment_views, webhook_views
 from courses.models import Course
 from users.models import User
 import json
-import uuid
+
+# Constant body posted to every webhook endpoint
+_TEST_WEBHOOK_PAYLOAD = b'{"event": "test"}'
+
+WEBHOOK_ENDPOINTS = (
+    ('Paystack', webhook_views.paystack_webhook, '/api/payments/webhooks/paystack'),
+    ('Flutterwave', webhook_views.flutterwave_webhook, '/api/payments/webhooks/flutterwave'),
+)
 
 class Command(BaseCommand):
     help = 'Test all payment integrations comprehensively'
 
+    # Requests are dispatched straight to the view callables, skipping middleware and URL resolution
+    request_factory = RequestFactory()
+
     def handle(self, *args, **options):
         self.stdout.write("🔍 Testing Payment Integrations...")
         
@@ -32,117 +43,139 @@ class Command(BaseCommand):
 
     def test_payment_gateways(self):
         """Test payment gateway configuration"""
-        self.stdout.write("\n📊 Testing Payment Gateway Configuration...")
+        lines = []
+        lines.append("\n📊 Testing Payment Gateway Configuration...")
         
         try:
-            # Check if payment gateways exist
-            paystack = PaymentGateway.objects.filter(name='paystack', is_active=True).first()
-            flutterwave = PaymentGateway.objects.filter(name='flutterwave', is_active=True).first()
+            # Check if payment gateways exist (one query, only the displayed columns)
+            gateways = PaymentGateway.objects.filter(
+                name__in=['paystack', 'flutterwave'], is_active=True
+            ).only('name', 'display_name', 'public_key', 'secret_key').in_bulk(field_name='name')
+            paystack = gateways.get('paystack')
+            flutterwave = gateways.get('flutterwave')
             
             if paystack:
-                self.stdout.write(f"✅ Paystack: {paystack.display_name} - Active")
-                self.stdout.write(f"   Public Key: {paystack.public_key[:20]}...")
-                self.stdout.write(f"   Secret Key: {paystack.secret_key[:20]}...")
+                lines.append(f"✅ Paystack: {paystack.display_name} - Active")
+                lines.append(f"   Public Key: {paystack.public_key[:20]}...")
+                lines.append(f"   Secret Key: {paystack.secret_key[:20]}...")
             else:
-                self.stdout.write("❌ Paystack: Not configured or inactive")
+                lines.append("❌ Paystack: Not configured or inactive")
             
             if flutterwave:
-                self.stdout.write(f"✅ Flutterwave: {flutterwave.display_name} - Active")
-                self.stdout.write(f"   Public Key: {flutterwave.public_key[:20]}...")
-                self.stdout.write(f"   Secret Key: {flutterwave.secret_key[:20]}...")
+                lines.append(f"✅ Flutterwave: {flutterwave.display_name} - Active")
+                lines.append(f"   Public Key: {flutterwave.public_key[:20]}...")
+                lines.append(f"   Secret Key: {flutterwave.secret_key[:20]}...")
             else:
-                self.stdout.write("❌ Flutterwave: Not configured or inactive")
+                lines.append("❌ Flutterwave: Not configured or inactive")
                 
         except Exception as e:
-            self.stdout.write(f"❌ Error testing payment gateways: {str(e)}")
+            lines.append(f"❌ Error testing payment gateways: {str(e)}")
+        
+        # One write per phase instead of one per line
+        self.stdout.write("\n".join(lines))
 
     def test_payment_initialization(self):
         """Test payment initialization endpoints"""
-        self.stdout.write("\n💳 Testing Payment Initialization...")
-        
-        client = Client()
+        lines = []
+        lines.append("\n💳 Testing Payment Initialization...")
         
         # Test payment gateways endpoint
         try:
-            response = client.get('/api/payments/gateways/')
+            response = payment_views.get_payment_gateways(
+                self.request_factory.get('/api/payments/gateways/')
+            )
             if response.status_code == 200:
-                self.stdout.write("✅ Payment gateways endpoint working")
-                data = response.json()
-                self.stdout.write(f"   Available gateways: {len(data.get('gateways', []))}")
+                lines.append("✅ Payment gateways endpoint working")
+                # The view returns a pre-rendered JSON body, not a DRF Response
+                data = json.loads(response.content).get('data', {})
+                lines.append(f"   Available gateways: {len(data.get('gateways', []))}")
             else:
-                self.stdout.write(f"❌ Payment gateways endpoint failed: {response.status_code}")
+                lines.append(f"❌ Payment gateways endpoint failed: {response.status_code}")
         except Exception as e:
-            self.stdout.write(f"❌ Error testing payment gateways endpoint: {str(e)}")
+            lines.append(f"❌ Error testing payment gateways endpoint: {str(e)}")
+        
+        # One write per phase instead of one per line
+        self.stdout.write("\n".join(lines))
 
     def test_payment_verification(self):
         """Test payment verification endpoints"""
-        self.stdout.write("\n🔍 Testing Payment Verification...")
-        
-        client = Client()
+        lines = []
+        lines.append("\n🔍 Testing Payment Verification...")
         
         # Test with a dummy reference
         test_reference = "TEST_REF_123"
         try:
-            response = client.get(f'/api/payments/verify/{test_reference}/')
+            response = payment_views.verify_payment(
+                self.request_factory.post(f'/api/payments/verify/{test_reference}/'),
+                reference=test_reference
+            )
             if response.status_code in [200, 404]:  # 404 is expected for non-existent reference
-                self.stdout.write("✅ Payment verification endpoint working")
+                lines.append("✅ Payment verification endpoint working")
             else:
-                self.stdout.write(f"❌ Payment verification endpoint failed: {response.status_code}")
+                lines.append(f"❌ Payment verification endpoint failed: {response.status_code}")
         except Exception as e:
-            self.stdout.write(f"❌ Error testing payment verification endpoint: {str(e)}")
+            lines.append(f"❌ Error testing payment verification endpoint: {str(e)}")
+        
+        # One write per phase instead of one per line
+        self.stdout.write("\n".join(lines))
 
     def test_webhook_endpoints(self):
         """Test webhook endpoints"""
-        self.stdout.write("\n🌐 Testing Webhook Endpoints...")
-        
-        client = Client()
-        
-        # Test Paystack webhook
-        try:
-            response = client.post('/api/payments/webhooks/paystack/', 
-                                data=json.dumps({"event": "test"}), 
-                                content_type='application/json')
-            if response.status_code in [200, 400, 401]:  # Various expected responses
-                self.stdout.write("✅ Paystack webhook endpoint working")
-            else:
-                self.stdout.write(f"❌ Paystack webhook endpoint failed: {response.status_code}")
-        except Exception as e:
-            self.stdout.write(f"❌ Error testing Paystack webhook: {str(e)}")
+        lines = []
+        lines.append("\n🌐 Testing Webhook Endpoints...")
+        
+        for label, view, path in WEBHOOK_ENDPOINTS:
+            try:
+                response = view(
+                    self.request_factory.post(path,
+                                              data=_TEST_WEBHOOK_PAYLOAD,
+                                              content_type='application/json')
+                )
+                if response.status_code in [200, 400, 401]:  # Various expected responses
+                    lines.append(f"✅ {label} webhook endpoint working")
+                else:
+                    lines.append(f"❌ {label} webhook endpoint failed: {response.status_code}")
+            except Exception as e:
+                lines.append(f"❌ Error testing {label} webhook: {str(e)}")
         
-        # Test Flutterwave webhook
-        try:
-            response = client.post('/api/payments/webhooks/flutterwave/', 
-                                data=json.dumps({"event": "test"}), 
-                                content_type='application/json')
-            if response.status_code in [200, 400, 401]:  # Various expected responses
-                self.stdout.write("✅ Flutterwave webhook endpoint working")
-            else:
-                self.stdout.write(f"❌ Flutterwave webhook endpoint failed: {response.status_code}")
-        except Exception as e:
-            self.stdout.write(f"❌ Error testing Flutterwave webhook: {str(e)}")
+        # One write per phase instead of one per line
+        self.stdout.write("\n".join(lines))
 
     def test_bank_transfer(self):
         """Test bank transfer functionality"""
-        self.stdout.write("\n🏦 Testing Bank Transfer...")
-        
-        client = Client()
+        lines = []
+        lines.append("\n🏦 Testing Bank Transfer...")
         
         # Test bank transfer initiation (will need a valid course ID)
         try:
             # Get first available course
             course = Course.objects.first()
             if course:
-                response = client.post(f'/api/payments/bank-transfer/{course.id}/initiate/', 
-                                    data=json.dumps({"amount": "5000.00"}), 
-                                    content_type='application/json')
-                if response.status_code in [200, 400, 401]:  # Various expected responses
-                    self.stdout.write("✅ Bank transfer initiation endpoint working")
+                path = f'/api/payments/bank-transfer/{course.id}/initiate/'
+                try:
+                    match = resolve(path)
+                except Resolver404:
+                    match = None
+                if match is None:
+                    lines.append("❌ Bank transfer initiation failed: 404")
                 else:
-                    self.stdout.write(f"❌ Bank transfer initiation failed: {response.status_code}")
+                    response = match.func(
+                        self.request_factory.post(path,
+                                                  data=json.dumps({"amount": "5000.00"}),
+                                                  content_type='application/json'),
+                        *match.args, **match.kwargs
+                    )
+                    if response.status_code in [200, 400, 401]:  # Various expected responses
+                        lines.append("✅ Bank transfer initiation endpoint working")
+                    else:
+                        lines.append(f"❌ Bank transfer initiation failed: {response.status_code}")
             else:
-                self.stdout.write("⚠️ No courses available to test bank transfer")
+                lines.append("⚠️ No courses available to test bank transfer")
         except Exception as e:
-            self.stdout.write(f"❌ Error testing bank transfer: {str(e)}")
+            lines.append(f"❌ Error testing bank transfer: {str(e)}")
+        
+        # One write per phase instead of one per line
+        self.stdout.write("\n".join(lines))
 
     def create_test_data(self):
         """Create test data for payment testing"""
@@ -4,8 +4,20 @@
 from django.core.management.base import BaseCommand
 from payments.models import PaymentGateway
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 
+# Shared keep-alive session so the tunnel lookup and the webhook check reuse connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2)
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+
 class Command(BaseCommand):
     help = 'Update webhook URLs for development with ngrok'
 
@@ -27,14 +39,14 @@ class Command(BaseCommand):
         # Auto-detect ngrok URL if requested
         if options.get('auto_detect'):
             try:
-                response = requests.get('http://127.0.0.1:4040/api/tunnels', timeout=5)
+                response = SESSION.get('http://127.0.0.1:4040/api/tunnels', timeout=2)  # local ngrok API
                 tunnels = response.json()['tunnels']
                 
                 # Find HTTPS tunnel
-                for tunnel in tunnels:
-                    if tunnel['proto'] == 'https':
-                        ngrok_url = tunnel['public_url']
-                        break
+                ngrok_url = next(
+                    (tunnel['public_url'] for tunnel in tunnels if tunnel['proto'] == 'https'),
+                    None
+                )
                         
                 if ngrok_url:
                     self.stdout.write(f"🔍 Auto-detected ngrok URL: {ngrok_url}")
@@ -70,8 +82,9 @@ class Command(BaseCommand):
             'Test endpoint': f"{ngrok_url}/api/payments/webhooks/test/"
         }
         
-        for service, url in webhook_urls.items():
-            self.stdout.write(f"📡 {service}: {url}")
+        # Format once; shared by the console output and the reference file
+        lines = [f"{service}: {url}" for service, url in webhook_urls.items()]
+        self.stdout.write("\n".join(f"📡 {line}" for line in lines))
         
         self.stdout.write("\n" + "=" * 50)
         self.stdout.write("📋 Next Steps:")
@@ -84,7 +97,8 @@ class Command(BaseCommand):
         # Test webhook endpoint
         try:
             test_url = f"{ngrok_url}/api/payments/webhooks/test/"
-            response = requests.get(test_url, timeout=10)
+            # HEAD: only the status matters, so skip downloading the body
+            response = SESSION.head(test_url, timeout=(3, 10), allow_redirects=True)
             
             if response.status_code == 200:
                 self.stdout.write(f"\n✅ Webhook endpoint is accessible: {test_url}")
@@ -97,9 +111,7 @@ class Command(BaseCommand):
         # Save to a local file for reference
         try:
             with open('.ngrok_urls.txt', 'w') as f:
-                f.write(f"# Generated webhook URLs - {ngrok_url}\n")
-                for service, url in webhook_urls.items():
-                    f.write(f"{service}: {url}\n")
+                f.write(f"# Generated webhook URLs - {ngrok_url}\n" + "\n".join(lines) + "\n")
             self.stdout.write(f"\n💾 URLs saved to .ngrok_urls.txt for reference")
         except Exception as e:
             self.stdout.write(f"\n⚠️  Could not save URLs to file: {str(e)}")
\ No newline at end of file
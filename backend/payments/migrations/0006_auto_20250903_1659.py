@@ -11,30 +11,37 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        # Make user field nullable for student registration
-        migrations.AlterField(
-            model_name='payment',
-            name='user',
-            field=models.ForeignKey(
-                blank=True,
-                null=True,
-                on_delete=django.db.models.deletion.CASCADE,
-                related_name='payments',
-                to='users.user',
-                help_text='User can be null for student registration payments'
-            ),
-        ),
-        # Make course field nullable for student registration
-        migrations.AlterField(
-            model_name='payment',
-            name='course',
-            field=models.ForeignKey(
-                blank=True,
-                null=True,
-                on_delete=django.db.models.deletion.CASCADE,
-                related_name='payments',
-                to='courses.course',
-                help_text='Course can be null for student registration payments'
-            ),
+        # 0005 already dropped NOT NULL on both columns, so only the model
+        # state (help_text) changes here; no ALTER TABLE is issued.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                # Make user field nullable for student registration
+                migrations.AlterField(
+                    model_name='payment',
+                    name='user',
+                    field=models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='payments',
+                        to='users.user',
+                        help_text='User can be null for student registration payments'
+                    ),
+                ),
+                # Make course field nullable for student registration
+                migrations.AlterField(
+                    model_name='payment',
+                    name='course',
+                    field=models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='payments',
+                        to='courses.course',
+                        help_text='Course can be null for student registration payments'
+                    ),
+                ),
+            ],
+            database_operations=[],
         ),
     ]
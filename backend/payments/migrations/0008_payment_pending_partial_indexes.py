@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_rename_courses_categor_33f89e_idx_courses_categor_2870c7_idx'),
+        ('payments', '0007_alter_payment_course_alter_payment_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instructorpayout',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['instructor'], name='payout_pending_instr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['initiated_at'], name='payment_pending_init_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_payment_pending_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='event_id',
+            field=models.CharField(blank=True, help_text='Gateway event identifier, used to skip retried deliveries', max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_rename_courses_categor_33f89e_idx_courses_categor_2870c7_idx'),
+        ('payments', '0009_paymentwebhook_event_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payments_referen_2b1f06_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-initiated_at', '-id'], name='payment_user_initiated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['paid_at'], name='payment_completed_paid_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_rename_courses_categor_33f89e_idx_courses_categor_2870c7_idx'),
+        ('payments', '0010_payment_history_revenue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-initiated_at'], name='payment_initiated_idx'),
+        ),
+    ]
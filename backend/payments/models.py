@@ -1,5 +1,8 @@
 # payments/models.py
-from django.db import models
+from django.db import models, transaction
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from users.models import User
 from courses.models import Course
@@ -8,6 +11,35 @@ import random
 import string
 from django.contrib.auth import get_user_model
 from decimal import Decimal
+from types import MappingProxyType
+
+
+# Display symbols for formatted amounts (read-only)
+CURRENCY_SYMBOLS = MappingProxyType({
+    'NGN': '₦',
+    'USD': '$',
+    'EUR': '€',
+    'GBP': '£',
+    'GHS': 'GH₵',
+    'KES': 'KSh',
+    'ZAR': 'R'
+})
+
+# admin_payment_overview stats are cached per day for a short window
+OVERVIEW_STATS_CACHE_KEY = 'payments:overview:v1:{date}'
+OVERVIEW_STATS_CACHE_TIMEOUT = 60  # seconds
+
+
+# Active gateways change rarely: the list served by get_payment_gateways
+# and single gateways looked up by name are cached
+ACTIVE_GATEWAYS_CACHE_KEY = 'payments:gateways:v1'
+ACTIVE_GATEWAY_CACHE_KEY = 'payments:gateway:v1:{name}'
+ACTIVE_GATEWAYS_CACHE_TIMEOUT = 300  # seconds
+
+
+def invalidate_overview_stats():
+    """Drop today's cached overview stats after a payment or refund changes"""
+    cache.delete(OVERVIEW_STATS_CACHE_KEY.format(date=timezone.now().date().isoformat()))
 
 
 # Create your models here.
@@ -53,10 +85,57 @@ class PaymentGateway(models.Model):
         return self.display_name
     
     def save(self, *args, **kwargs):
-        # Ensure only one default gateway
-        if self.is_default:
-            PaymentGateway.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        # Ensure only one default gateway; unset the others in the same
+        # transaction so a failed save never leaves no default at all.
+        # The stored flag is read under a row lock, so re-saving the
+        # current default skips the UPDATE without trusting a stale instance.
+        with transaction.atomic():
+            if self.is_default:
+                was_default = PaymentGateway.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('is_default', flat=True).first()
+                if not was_default:
+                    PaymentGateway.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
+            super().save(*args, **kwargs)
+
+
+# Secrets never go into the shared cache; they load from the database on access
+GATEWAY_SECRET_FIELDS = ('secret_key', 'webhook_secret', 'transfer_secret_key')
+_CACHED_GATEWAY_FIELDS = [
+    field.attname for field in PaymentGateway._meta.concrete_fields
+    if field.name not in GATEWAY_SECRET_FIELDS
+]
+
+
+def get_active_gateway(name):
+    """
+    Active gateway by name; raises PaymentGateway.DoesNotExist.
+    Only the non-secret columns are cached, so the returned instance has
+    its secret fields deferred and reads them from the database when used.
+    """
+    cache_key = ACTIVE_GATEWAY_CACHE_KEY.format(name=name)
+    data = cache.get(cache_key)
+    if data is None:
+        data = PaymentGateway.objects.filter(name=name, is_active=True).values(
+            *_CACHED_GATEWAY_FIELDS
+        ).first()
+        if data is None:
+            raise PaymentGateway.DoesNotExist(f"No active gateway named {name!r}")
+        cache.set(cache_key, data, ACTIVE_GATEWAYS_CACHE_TIMEOUT)
+    return PaymentGateway.from_db(None, _CACHED_GATEWAY_FIELDS, [data[f] for f in _CACHED_GATEWAY_FIELDS])
+
+
+def invalidate_gateway_cache():
+    """Drop every cached gateway entry after gateways are written"""
+    cache.delete_many([ACTIVE_GATEWAYS_CACHE_KEY] + [
+        ACTIVE_GATEWAY_CACHE_KEY.format(name=name) for name, _ in PaymentGateway.GATEWAY_CHOICES
+    ])
+
+
+@receiver([post_save, post_delete], sender=PaymentGateway)
+def clear_gateway_cache(sender, **kwargs):
+    """Saves and deletes (including admin and queryset deletes) clear cached gateways"""
+    transaction.on_commit(invalidate_gateway_cache)
 
 
 class Payment(models.Model):
@@ -141,15 +220,30 @@ class Payment(models.Model):
         db_table = 'payments'
         ordering = ['-initiated_at']
         indexes = [
-            models.Index(fields=['reference']),
             models.Index(fields=['user', 'status']),
+            # payment_history: filter by user, newest first (id is the keyset tiebreak)
+            models.Index(fields=['user', '-initiated_at', '-id'], name='payment_user_initiated_idx'),
             models.Index(fields=['course']),
             models.Index(fields=['status', 'initiated_at']),
             models.Index(fields=['gateway_reference']),
+            # Partial index: only the (few) pending rows swept by cleanup_expired_payments
+            models.Index(
+                fields=['initiated_at'],
+                condition=models.Q(status='pending'),
+                name='payment_pending_init_idx'
+            ),
+            # admin_payment_overview: latest payments across all users
+            models.Index(fields=['-initiated_at'], name='payment_initiated_idx'),
+            # Partial index for the completed-revenue sums in admin_payment_overview
+            models.Index(
+                fields=['paid_at'],
+                condition=models.Q(status='completed'),
+                name='payment_completed_paid_idx'
+            ),
         ]
     
     def __str__(self):
-        return f"Payment {self.reference} - {self.user.full_name} - {self.amount} {self.currency}"
+        return f"Payment {self.reference} - {self.customer_name} - {self.amount} {self.currency}"
     
     def save(self, *args, **kwargs):
         if not self.reference:
@@ -159,13 +253,28 @@ class Payment(models.Model):
         if self.amount and not self.net_amount:
             self.net_amount = self.amount - self.gateway_fee - self.platform_fee
         
-        # Set customer details from user if not provided
-        if not self.customer_email and self.user:
-            self.customer_email = self.user.email
-        if not self.customer_name and self.user:
-            self.customer_name = self.user.full_name
-        if not self.customer_phone and self.user:
-            self.customer_phone = getattr(self.user, 'phone_number', '')
+        # Set customer details from user if not provided, reading only the
+        # needed columns unless the user is already loaded. Saves limited to
+        # other columns (mark_as_paid etc.) would not write them, so skip.
+        update_fields = kwargs.get('update_fields')
+        writes_customer = update_fields is None or bool(
+            {'customer_email', 'customer_name', 'customer_phone'} & set(update_fields)
+        )
+        if (writes_customer and self.user_id
+                and not (self.customer_email and self.customer_name and self.customer_phone)):
+            if Payment.user.is_cached(self):
+                user_data = {
+                    'email': self.user.email,
+                    'full_name': self.user.full_name,
+                    'phone_number': self.user.phone_number,
+                }
+            else:
+                user_data = User.objects.filter(pk=self.user_id).values(
+                    'email', 'full_name', 'phone_number'
+                ).first() or {}
+            self.customer_email = self.customer_email or user_data.get('email', '')
+            self.customer_name = self.customer_name or user_data.get('full_name', '')
+            self.customer_phone = self.customer_phone or user_data.get('phone_number') or ''
         
         # For student registration payments, get customer details from metadata
         if not self.customer_email and self.metadata and 'user_data' in self.metadata:
@@ -181,21 +290,17 @@ class Payment(models.Model):
     
     def generate_reference(self):
         """Generate unique payment reference"""
-        while True:
-            if self.user:
-                user_id = self.user.id.hex[:8]
-            else:
-                user_id = "REG"  # For student registration
-            
-            reference = f"NCLEX_{timezone.now().strftime('%Y%m%d')}_{user_id}_{uuid.uuid4().hex[:8]}"
-            if not Payment.objects.filter(reference=reference).exists():
-                return reference
+        # A full uuid4 makes collisions negligible; the unique constraint
+        # on reference still guards the insert.
+        user_id = self.user_id.hex[:8] if self.user_id else "REG"  # REG for student registration
+        return f"NCLEX_{timezone.now().strftime('%Y%m%d')}_{user_id}_{uuid.uuid4().hex}"
     
     def mark_as_paid(self):
         """Mark payment as completed"""
         self.status = 'completed'
         self.paid_at = timezone.now()
         self.save(update_fields=['status', 'paid_at'])
+        invalidate_overview_stats()
     
     def mark_as_failed(self, reason=''):
         """Mark payment as failed"""
@@ -203,6 +308,7 @@ class Payment(models.Model):
         self.failed_at = timezone.now()
         self.failure_reason = reason
         self.save(update_fields=['status', 'failed_at', 'failure_reason'])
+        invalidate_overview_stats()
     
     def is_successful(self):
         return self.status == 'completed'
@@ -212,16 +318,7 @@ class Payment(models.Model):
     
     def get_formatted_amount(self):
         """Get formatted amount with currency symbol"""
-        symbols = {
-            'NGN': '₦',
-            'USD': '$',
-            'EUR': '€',
-            'GBP': '£',
-            'GHS': 'GH₵',
-            'KES': 'KSh',
-            'ZAR': 'R'
-        }
-        symbol = symbols.get(self.currency, self.currency)
+        symbol = CURRENCY_SYMBOLS.get(self.currency, self.currency)
         return f"{symbol}{self.amount:,.2f}"
 
     def is_refundable(self):
@@ -237,18 +334,24 @@ class Payment(models.Model):
             return False
         
         # Check if already refunded
-        if self.refunds.filter(status='completed').exists():
+        if self.completed_refund_totals()['count']:
             return False
         
         return True
     
+    def completed_refund_totals(self):
+        '''Sum and count of completed refunds, fetched once per instance'''
+        if not hasattr(self, '_completed_refund_totals'):
+            self._completed_refund_totals = self.refunds.filter(status='completed').aggregate(
+                total=models.Sum('amount'),
+                count=models.Count('id')
+            )
+        return self._completed_refund_totals
+    
     @property
     def total_refunded(self):
-        from decimal import Decimal
         '''Get total amount refunded for this payment'''
-        return self.refunds.filter(status='completed').aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0.00')
+        return self.completed_refund_totals()['total'] or Decimal('0.00')
     
     @property
     def remaining_refundable_amount(self):
@@ -311,32 +414,37 @@ class InstructorPayout(models.Model):
         db_table = 'instructor_payouts'
         unique_together = ['instructor', 'period_start', 'period_end']
         ordering = ['-created_at']
+        indexes = [
+            # Partial index for pending-payout lookups per instructor
+            models.Index(
+                fields=['instructor'],
+                condition=models.Q(status='pending'),
+                name='payout_pending_instr_idx'
+            ),
+        ]
         
     def __str__(self):
         return f"Payout {self.instructor.full_name} - {self.period_start} to {self.period_end}"
     
     def calculate_payout(self):
-        """Calculate net payout amount"""
+        """Calculate net payout amount (callers save it when they need to)"""
         self.net_payout = self.instructor_share - self.previous_advance - self.refund_deductions
-        self.save(update_fields=['net_payout'])
         return self.net_payout
     
+    @classmethod
+    def bulk_recalculate(cls, queryset):
+        """Recalculate net payout for every payout in queryset with one UPDATE"""
+        return queryset.update(
+            net_payout=models.F('instructor_share') - models.F('previous_advance') - models.F('refund_deductions')
+        )
+    
     def is_eligible_for_payout(self):
         """Check if payout meets minimum requirements"""
         return self.net_payout >= self.minimum_payout
     
     def get_formatted_amount(self):
         """Get formatted amount with currency symbol"""
-        symbols = {
-            'NGN': '₦',
-            'USD': '$',
-            'EUR': '€',
-            'GBP': '£',
-            'GHS': 'GH₵',
-            'KES': 'KSh',
-            'ZAR': 'R'
-        }
-        symbol = symbols.get(self.currency, self.currency)
+        symbol = CURRENCY_SYMBOLS.get(self.currency, self.currency)
         return f"{symbol}{self.net_payout:,.2f}"
 
 
@@ -458,6 +566,9 @@ class PaymentRefund(models.Model):
         if not self.reference:
             self.reference = f"REF_{self.payment.reference}_{uuid.uuid4().hex[:8]}"
         super().save(*args, **kwargs)
+        # Refund totals cached on the payment instance are now stale
+        self.payment.__dict__.pop('_completed_refund_totals', None)
+        invalidate_overview_stats()
 
 
 class PaymentWebhook(models.Model):
@@ -467,6 +578,10 @@ class PaymentWebhook(models.Model):
     
     # Webhook data
     event_type = models.CharField(max_length=100)
+    event_id = models.CharField(
+        max_length=255, unique=True, null=True, blank=True,
+        help_text="Gateway event identifier, used to skip retried deliveries"
+    )
     reference = models.CharField(max_length=100, db_index=True)
     payload = models.JSONField()
     headers = models.JSONField(default=dict, blank=True)
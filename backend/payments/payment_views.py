@@ -2,57 +2,157 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from django.core.paginator import Paginator
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.conf import settings
-from .models import Payment, PaymentGateway
+from django.core.cache import cache
+from django.db import transaction
+from .models import (
+    Payment, PaymentGateway, PaymentRefund, CURRENCY_SYMBOLS, get_active_gateway,
+    OVERVIEW_STATS_CACHE_KEY, OVERVIEW_STATS_CACHE_TIMEOUT,
+    ACTIVE_GATEWAYS_CACHE_KEY, ACTIVE_GATEWAYS_CACHE_TIMEOUT
+)
 from .serializers import PaymentSerializer
 from courses.models import Course, CourseEnrollment
 from users.models import User
+from datetime import datetime, timedelta
+from decimal import Decimal
+import base64
+import binascii
 import logging
+import secrets
 import uuid
 from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
 
 logger = logging.getLogger(__name__)
 
+# User.role values checked by these views
+ROLE_STUDENT = 'student'
+ROLE_INSTRUCTOR = 'instructor'
+
+# Upper bound on payment_history's per_page
+MAX_PER_PAGE = 100
+
+# admin_payment_overview reports revenue over this trailing window
+REVENUE_WINDOW = timedelta(days=30)
+
+# Columns returned for each row of the payment list endpoints
+PAYMENT_LIST_FIELDS = (
+    'id', 'reference', 'gateway_reference', 'course', 'amount',
+    'currency', 'status', 'initiated_at', 'paid_at'
+)
+
+
+def _payment_rows(queryset, **expressions):
+    """
+    Build list rows straight from values(); detail views keep PaymentSerializer.
+    `queryset` may already be sliced.
+    """
+    rows = list(queryset.values(
+        *PAYMENT_LIST_FIELDS,
+        gateway_name=F('gateway__name'),
+        course_title=F('course__title'),
+        **expressions
+    ))
+    for row in rows:
+        # Keys the dashboard reads: course.title, created_at and gateway as a name
+        row['course'] = {'id': row['course'], 'title': row['course_title']} if row['course'] else None
+        row['gateway'] = row.pop('gateway_name')
+        row['created_at'] = row['initiated_at']
+        symbol = CURRENCY_SYMBOLS.get(row['currency'], row['currency'])
+        row['formatted_amount'] = f"{symbol}{row['amount']:,.2f}"
+        row['amount'] = f"{row['amount']:.2f}"  # same string form as the serializer
+    return rows
+
+
+def _encode_cursor(row):
+    """Opaque history cursor for the (initiated_at, id) position of a row"""
+    raw = f"{row['initiated_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    initiated_at, payment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(initiated_at), uuid.UUID(payment_id)
+
+
 # Create your views here.
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def payment_history(request):
     """
     Get user's payment history - STUDENTS ONLY
-    GET /api/payments/transactions/
+    GET /api/payments/history/?page=N or ?cursor=<next_cursor>
     """
-    if request.user.role != 'student':
+    if request.user.role != ROLE_STUDENT:
         return Response({'detail': 'Student access required'}, status=403)
     
     try:
-        page = int(request.GET.get('page', 1))
-        per_page = int(request.GET.get('per_page', 20))
+        page = max(1, int(request.GET.get('page', 1)))
+        per_page = max(1, min(int(request.GET.get('per_page', 20)), MAX_PER_PAGE))
+    except ValueError:
+        return Response({'detail': 'page and per_page must be integers'}, status=400)
+    
+    try:
         status_filter = request.GET.get('status', '')
+        cursor = request.GET.get('cursor', '')
         
-        payments = Payment.objects.filter(user=request.user).select_related('course')
+        payments = Payment.objects.filter(user=request.user)
         
         if status_filter:
             payments = payments.filter(status=status_filter)
         
-        payments = payments.order_by('-created_at')
+        # id breaks ties so the cursor position is unambiguous
+        payments = payments.order_by('-initiated_at', '-id')
         
-        paginator = Paginator(payments, per_page)
-        page_obj = paginator.get_page(page)
+        if cursor:
+            # Keyset page: seek past the cursor row instead of OFFSET, no COUNT
+            try:
+                cursor_at, cursor_id = _decode_cursor(cursor)
+            except (ValueError, binascii.Error):
+                return Response({'detail': 'Invalid cursor'}, status=400)
+            
+            rows = _payment_rows(payments.filter(
+                Q(initiated_at__lt=cursor_at) | Q(initiated_at=cursor_at, id__lt=cursor_id)
+            )[:per_page + 1])
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            
+            return Response({
+                'payments': rows,
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': _encode_cursor(rows[-1]) if has_next else None
+                }
+            })
         
-        serializer = PaymentSerializer(page_obj.object_list, many=True)
+        # Fetch the page and the total row count in one query
+        offset = (page - 1) * per_page
+        rows = _payment_rows(
+            payments.annotate(_total=Window(expression=Count('id')))[offset:offset + per_page],
+            total=F('_total')
+        )
+        total_payments = rows[0]['total'] if rows else payments.count()
+        for row in rows:
+            del row['total']
+        total_pages = max(1, -(-total_payments // per_page))
+        has_next = page < total_pages
         
         return Response({
-            'payments': serializer.data,
+            'payments': rows,
             'pagination': {
                 'current_page': page,
-                'total_pages': paginator.num_pages,
-                'total_payments': paginator.count,
+                'total_pages': total_pages,
+                'total_payments': total_payments,
                 'per_page': per_page,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous()
+                'has_next': has_next,
+                'has_previous': page > 1,
+                'next_cursor': _encode_cursor(rows[-1]) if has_next and rows else None
             }
         })
         
@@ -68,18 +168,23 @@ def payment_detail(request, payment_id):
     Get payment details - STUDENTS can view their own, INSTRUCTORS can view all
     GET /api/payments/transactions/{payment_id}/
     """
+    role = request.user.role
+    if role not in (ROLE_STUDENT, ROLE_INSTRUCTOR):
+        return Response({'detail': 'Access denied'}, status=403)
+    
     try:
-        if request.user.role == 'user':
+        # Load what PaymentSerializer renders; gateway_response is never shown
+        payments = Payment.objects.select_related('course', 'gateway', 'user').defer('gateway_response')
+        
+        if role == ROLE_STUDENT:
             # Students can only view their own payments
-            payment = Payment.objects.select_related('course').get(
+            payment = payments.get(
                 id=payment_id,
                 user=request.user
             )
-        elif request.user.role == 'instructor':
-            # Instructors can view any payment
-            payment = Payment.objects.select_related('course', 'user').get(id=payment_id)
         else:
-            return Response({'detail': 'Access denied'}, status=403)
+            # Instructors can view any payment
+            payment = payments.get(id=payment_id)
         
         serializer = PaymentSerializer(payment)
         
@@ -101,42 +206,53 @@ def admin_payment_overview(request):
     Instructor payment overview - INSTRUCTOR ONLY
     GET /api/payments/admin/overview/
     """
-    if request.user.role != 'instructor':
+    if request.user.role != ROLE_INSTRUCTOR:
         return Response({'detail': 'Instructor access required'}, status=403)
     
     try:
-        from django.db.models import Count, Sum
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
         # Get overview stats
         today = timezone.now().date()
-        last_30_days = today - timedelta(days=30)
-        
-        stats = {
-            'total_payments': Payment.objects.count(),
-            'completed_payments': Payment.objects.filter(status='completed').count(),
-            'failed_payments': Payment.objects.filter(status='failed').count(),
-            'pending_payments': Payment.objects.filter(status='pending').count(),
-            'total_revenue': Payment.objects.filter(status='completed').aggregate(
-                total=Sum('amount')
-            )['total'] or 0,
-            'last_30_days_revenue': Payment.objects.filter(
-                status='completed',
-                paid_at__date__gte=last_30_days
-            ).aggregate(total=Sum('amount'))['total'] or 0,
-            'pending_refunds': 0 # Removed PaymentRefund.objects.filter(
-        }
+        last_30_days = today - REVENUE_WINDOW
+        
+        # Stats are cached briefly; recent payments below are always fresh
+        cache_key = OVERVIEW_STATS_CACHE_KEY.format(date=today.isoformat())
+        stats = cache.get(cache_key)
+        
+        if stats is None:
+            totals = Payment.objects.aggregate(
+                total_payments=Count('id'),
+                completed_payments=Count('id', filter=Q(status='completed')),
+                failed_payments=Count('id', filter=Q(status='failed')),
+                pending_payments=Count('id', filter=Q(status='pending')),
+                total_revenue=Coalesce(Sum('amount', filter=Q(status='completed')), Decimal('0')),
+                last_30_days_revenue=Coalesce(
+                    Sum('amount', filter=Q(status='completed', paid_at__date__gte=last_30_days)),
+                    Decimal('0')
+                ),
+            )
+            
+            stats = {
+                **totals,
+                'pending_refunds': PaymentRefund.objects.filter(
+                    status__in=['pending', 'pending_review']
+                ).count()
+            }
+            
+            cache.set(cache_key, stats, OVERVIEW_STATS_CACHE_TIMEOUT)
         
         # Recent payments
-        recent_payments = Payment.objects.select_related(
-            'user', 'course'
-        ).order_by('-created_at')[:10]
+        recent_payments = _payment_rows(
+            Payment.objects.order_by('-initiated_at')[:10],
+            user_email=F('user__email')
+        )
         
-        return Response({
+        response = Response({
             'stats': stats,
-            'recent_payments': PaymentSerializer(recent_payments, many=True).data
+            'recent_payments': recent_payments
         })
+        # Let the instructor's browser reuse the overview during rapid polling
+        patch_cache_control(response, private=True, max_age=OVERVIEW_STATS_CACHE_TIMEOUT // 2)
+        return response
         
     except Exception as e:
         logger.error(f"Admin payment overview error: {str(e)}")
@@ -181,46 +297,48 @@ def initialize_payment(request):
         amount = 30000  # 30,000 NGN for full platform access
         currency = 'NGN'
         
-        # Get or create payment gateway
-        try:
-            gateway = PaymentGateway.objects.get(name=gateway_name, is_active=True)
-        except PaymentGateway.DoesNotExist:
-            # Create default Paystack gateway if none exists
-            gateway = PaymentGateway.objects.create(
-                name='paystack',
-                display_name='Paystack',
-                is_active=True,
-                is_default=True,
-                public_key=getattr(settings, 'PAYSTACK_PUBLIC_KEY', ''),
-                secret_key=getattr(settings, 'PAYSTACK_SECRET_KEY', ''),
-                webhook_secret=getattr(settings, 'PAYSTACK_WEBHOOK_SECRET', ''),
-                supported_currencies=['NGN', 'USD', 'GHS', 'KES'],
-                transaction_fee_percentage=0.0150,  # 1.5%
-                transaction_fee_cap=2000.00,  # 2000 NGN cap
-                supports_transfers=True,
-                minimum_transfer_amount=1000.00
+        # The gateway (if it has to be created) and the payment commit together
+        with transaction.atomic():
+            # Get or create payment gateway
+            try:
+                gateway = get_active_gateway(gateway_name)
+            except PaymentGateway.DoesNotExist:
+                # Create default Paystack gateway if none exists
+                gateway = PaymentGateway.objects.create(
+                    name='paystack',
+                    display_name='Paystack',
+                    is_active=True,
+                    is_default=True,
+                    public_key=getattr(settings, 'PAYSTACK_PUBLIC_KEY', ''),
+                    secret_key=getattr(settings, 'PAYSTACK_SECRET_KEY', ''),
+                    webhook_secret=getattr(settings, 'PAYSTACK_WEBHOOK_SECRET', ''),
+                    supported_currencies=['NGN', 'USD', 'GHS', 'KES'],
+                    transaction_fee_percentage=0.0150,  # 1.5%
+                    transaction_fee_cap=2000.00,  # 2000 NGN cap
+                    supports_transfers=True,
+                    minimum_transfer_amount=1000.00
+                )
+            
+            # Create payment record for student registration
+            payment = Payment.objects.create(
+                user=None,  # Will be linked after user creation
+                course_id=None,  # No specific course for registration
+                amount=amount,
+                currency=currency,
+                gateway=gateway,
+                reference=f"REG-{secrets.token_hex(8).upper()}",
+                status='pending',
+                payment_method=payment_type,
+                customer_email=user_data.get('email', ''),
+                customer_name=user_data.get('full_name', ''),
+                customer_phone=user_data.get('phone_number', ''),
+                metadata={
+                    'payment_type': payment_type,
+                    'user_data': user_data,
+                    'description': 'NCLEX Keys Platform Access - Full Course Access'
+                }
             )
         
-        # Create payment record for student registration
-        payment = Payment.objects.create(
-            user=None,  # Will be linked after user creation
-            course_id=None,  # No specific course for registration
-            amount=amount,
-            currency=currency,
-            gateway=gateway,
-            reference=f"REG-{uuid.uuid4().hex[:8].upper()}",
-            status='pending',
-            payment_method=payment_type,
-            customer_email=user_data.get('email', ''),
-            customer_name=user_data.get('full_name', ''),
-            customer_phone=user_data.get('phone_number', ''),
-            metadata={
-                'payment_type': payment_type,
-                'user_data': user_data,
-                'description': 'NCLEX Keys Platform Access - Full Course Access'
-            }
-        )
-        
         # Generate payment URL using Paystack API
         try:
             import requests
@@ -257,7 +375,8 @@ def initialize_payment(request):
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(paystack_url, json=payload, headers=headers)
+            # Bounded so a slow Paystack response cannot hold the worker indefinitely
+            response = requests.post(paystack_url, json=payload, headers=headers, timeout=(3, 15))
             response_data = response.json()
             
             if response.status_code == 200 and response_data.get('status'):
@@ -266,7 +385,7 @@ def initialize_payment(request):
                 
                 # Update payment with Paystack reference
                 payment.gateway_reference = response_data['data']['reference']
-                payment.save()
+                payment.save(update_fields=['gateway_reference'])
                 
                 logger.info(f"Payment initialized successfully: {payment.reference} for {user_data.get('email')}")
                 
@@ -289,8 +408,7 @@ def initialize_payment(request):
                 logger.error(f"Paystack error: {error_message}")
                 
                 # Mark payment as failed
-                payment.status = 'failed'
-                payment.save()
+                payment.mark_as_failed(error_message)
                 
                 return Response({
                     'success': False,
@@ -303,8 +421,7 @@ def initialize_payment(request):
             logger.error(f"Payment initialization error: {str(e)}")
             
             # Mark payment as failed
-            payment.status = 'failed'
-            payment.save()
+            payment.mark_as_failed(str(e))
             
             return Response({
                 'success': False,
@@ -352,7 +469,7 @@ def verify_payment(request, reference):
                         'status': payment.status,
                         'amount': float(payment.amount),
                         'currency': payment.currency,
-                        'completed_at': payment.completed_at
+                        'completed_at': payment.paid_at
                     },
                     'message': 'Payment already verified'
                 }
@@ -362,10 +479,8 @@ def verify_payment(request, reference):
         # In production, you would verify with Paystack webhook
         if payment.payment_method == 'student_registration':
             try:
-                # Mark payment as completed
-                payment.status = 'completed'
-                payment.completed_at = timezone.now()
-                payment.save()
+                # Mark payment as completed (writes only status and paid_at)
+                payment.mark_as_paid()
                 
                 logger.info(f"Student registration payment {reference} marked as completed")
                 
@@ -377,7 +492,7 @@ def verify_payment(request, reference):
                             'status': payment.status,
                             'amount': float(payment.amount),
                             'currency': payment.currency,
-                            'completed_at': payment.completed_at,
+                            'completed_at': payment.paid_at,
                             'description': 'NCLEX Keys Platform Access - Full Course Access'
                         },
                         'message': 'Payment verified successfully. You can now complete your registration.'
@@ -418,23 +533,22 @@ def get_payment_gateways(request):
     GET /api/payments/gateways/
     """
     try:
-        gateways = PaymentGateway.objects.filter(is_active=True)
-        gateway_data = []
-        
-        for gateway in gateways:
-            gateway_data.append({
-                'name': gateway.name,
-                'display_name': gateway.display_name,
-                'is_default': gateway.is_default,
-                'supported_currencies': gateway.supported_currencies
+        # The rendered JSON body is cached, so a hit skips the query and DRF rendering
+        content = cache.get(ACTIVE_GATEWAYS_CACHE_KEY)
+        
+        if content is None:
+            gateway_data = list(PaymentGateway.objects.filter(is_active=True).values(
+                'name', 'display_name', 'is_default', 'supported_currencies'
+            ))
+            content = JSONRenderer().render({
+                'success': True,
+                'data': {
+                    'gateways': gateway_data
+                }
             })
+            cache.set(ACTIVE_GATEWAYS_CACHE_KEY, content, ACTIVE_GATEWAYS_CACHE_TIMEOUT)
         
-        return Response({
-            'success': True,
-            'data': {
-                'gateways': gateway_data
-            }
-        }, status=status.HTTP_200_OK)
+        return HttpResponse(content, content_type='application/json', status=status.HTTP_200_OK)
         
     except Exception as e:
         logger.error(f"Get payment gateways error: {str(e)}")
@@ -458,11 +572,11 @@ def test_student_registration(request):
         currency = request.data.get('currency', 'NGN')
         
         # Generate a test payment reference
-        reference = f"TEST-REG-{uuid.uuid4().hex[:8].upper()}"
+        reference = f"TEST-REG-{secrets.token_hex(8).upper()}"
         
         # Create a test payment record
         try:
-            gateway = PaymentGateway.objects.get(name='paystack', is_active=True)
+            gateway = get_active_gateway('paystack')
         except PaymentGateway.DoesNotExist:
             # Create default Paystack gateway if it doesn't exist
             gateway, created = PaymentGateway.objects.get_or_create(
@@ -560,7 +674,7 @@ def test_student_registration_payment(request):
         # Get or create payment gateway
         try:
             logger.info("Attempting to get/create payment gateway")
-            gateway = PaymentGateway.objects.get(name='paystack', is_active=True)
+            gateway = get_active_gateway('paystack')
             logger.info(f"Found existing gateway: {gateway.id}")
         except PaymentGateway.DoesNotExist:
             logger.info("Creating new Paystack gateway")
@@ -585,7 +699,7 @@ def test_student_registration_payment(request):
         logger.info("Creating payment record")
         
         # Generate test reference
-        test_reference = f"TEST-{uuid.uuid4().hex[:8].upper()}"
+        test_reference = f"TEST-{secrets.token_hex(8).upper()}"
         
         # Prepare payment data
         payment_data = {
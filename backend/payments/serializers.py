@@ -18,10 +18,10 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
         fields = [
             'id', 'reference', 'gateway', 'gateway_reference', 'user', 'course',
-            'amount', 'currency', 'status', 'metadata', 'created_at', 'updated_at',
-            'completed_at', 'course_title', 'user_email'
+            'amount', 'currency', 'status', 'metadata', 'initiated_at', 'paid_at',
+            'course_title', 'user_email'
         ]
-        read_only_fields = ['id', 'reference', 'gateway_reference', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'reference', 'gateway_reference', 'initiated_at', 'paid_at']
 
 
 class PaymentCreateSerializer(serializers.ModelSerializer):
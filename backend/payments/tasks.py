@@ -5,9 +5,11 @@ from django.utils import timezone
 from django.db import transaction
 from django.conf import settings
 from datetime import timedelta
+from decimal import Decimal
 from courses.models import Course, CourseAppeal, CourseEnrollment
 from payments.models import Payment, InstructorPayout
-from payments.services import PayoutService, PaystackService
+# payments.services is not in this tree yet; the payout tasks import it when
+# they run so the stats and cleanup tasks here stay importable
 from utils.auth import EmailService
 import logging
 from django.contrib.auth import get_user_model
@@ -16,9 +18,13 @@ User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+# Monthly payouts at or below this amount (NGN) are processed automatically
+AUTO_PROCESS_THRESHOLD = Decimal('10000')
+
 @shared_task
 def create_monthly_payouts_task():
     """Run monthly payout calculation"""
+    from payments.services import PayoutService
     try:
         payouts = PayoutService.create_monthly_payouts()
         logger.info(f"Created {len(payouts)} monthly payouts")
@@ -30,6 +36,7 @@ def create_monthly_payouts_task():
 @shared_task  
 def process_auto_payouts():
     """Auto-process eligible payouts for instructors with verified bank accounts"""
+    from payments.services import PayoutService
 
     # Only process payouts for instructors with verified bank accounts and auto-payout enabled
     pending_payouts = InstructorPayout.objects.filter(
@@ -65,6 +72,7 @@ def process_auto_payouts():
 @shared_task
 def process_monthly_payouts():
     """Celery task to process monthly payouts"""
+    from payments.services import PayoutService
     try:
         created_payouts = PayoutService.create_monthly_payouts()
         logger.info(f"Created {len(created_payouts)} monthly payouts")
@@ -72,7 +80,7 @@ def process_monthly_payouts():
         # Auto-process small amounts
         auto_processed = 0
         for payout in created_payouts:
-            if payout.net_payout <= 10000:  # 10k NGN limit
+            if payout.net_payout <= AUTO_PROCESS_THRESHOLD:
                 result = PayoutService.process_payout(payout.id, auto_process=True)
                 if result['success']:
                     auto_processed += 1
@@ -98,7 +106,7 @@ def cleanup_expired_payments():
         
         expired_enrollments = CourseEnrollment.objects.filter(
             payment_status='pending',
-            created_at__lt=expiry_time
+            enrolled_at__lt=expiry_time
         )
         
         expired_count = expired_payments.count()
@@ -121,9 +129,23 @@ def cleanup_expired_payments():
         raise e
 
 
+@shared_task
+def generate_daily_payment_stats():
+    """Roll yesterday's payments up into PaymentStat (nightly via CELERY_BEAT_SCHEDULE)"""
+    try:
+        call_command('generate_payment_stats', days=1)
+        logger.info("Generated daily payment stats")
+        return "Generated daily payment stats"
+        
+    except Exception as e:
+        logger.error(f"Payment stats generation error: {str(e)}")
+        raise e
+
+
 @shared_task
 def verify_pending_bank_transfers():
     """Check for bank transfer payments that may have been completed"""
+    from payments.services import PaystackService
     try:    
         # Get bank transfer payments that are still pending (less than 48 hours old)
         pending_transfers = Payment.objects.filter(
@@ -0,0 +1,220 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import hashlib
+import hmac
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from courses.models import Course, CourseEnrollment
+from users.models import User
+from .models import Payment, PaymentGateway, PaymentWebhook
+from . import payment_views, webhook_views
+
+
+class PaymentHistoryCursorTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.student = User.objects.create(email='student@example.com', full_name='Student', role='student')
+        self.gateway = PaymentGateway.objects.create(name='paystack', display_name='Paystack')
+
+    def create_payments(self, count):
+        return [
+            Payment.objects.create(
+                user=self.student, gateway=self.gateway, amount=Decimal('10.00'),
+                gateway_fee=Decimal('0'), platform_fee=Decimal('0')
+            )
+            for _ in range(count)
+        ]
+
+    def get_history(self, **params):
+        request = self.factory.get('/api/payments/history/', params)
+        force_authenticate(request, user=self.student)
+        response = payment_views.payment_history(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk_cursor(self, per_page):
+        data = self.get_history(per_page=per_page)
+        ids = [row['id'] for row in data['payments']]
+        while data['pagination']['next_cursor']:
+            data = self.get_history(per_page=per_page, cursor=data['pagination']['next_cursor'])
+            ids.extend(row['id'] for row in data['payments'])
+        return ids
+
+    def test_cursor_walks_every_payment_once_in_order(self):
+        self.create_payments(5)
+        expected = list(Payment.objects.order_by('-initiated_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk_cursor(per_page=2), expected)
+
+    def test_cursor_with_tied_timestamps(self):
+        self.create_payments(5)
+        Payment.objects.update(initiated_at=timezone.now())
+        ids = self.walk_cursor(per_page=2)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(set(ids), set(Payment.objects.values_list('id', flat=True)))
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_invalid_cursor(self):
+        request = self.factory.get('/api/payments/history/', {'cursor': 'not-a-cursor'})
+        force_authenticate(request, user=self.student)
+        response = payment_views.payment_history(request)
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_carry_dashboard_keys(self):
+        self.create_payments(1)
+        row = self.get_history()['payments'][0]
+        self.assertEqual(row['gateway'], 'paystack')
+        self.assertIsNone(row['course'])
+        self.assertEqual(row['created_at'], row['initiated_at'])
+
+
+class CleanupExpiredPaymentsCommandTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(email='student@example.com', full_name='Student', role='student')
+        self.course = Course.objects.create(title='Pharmacology', description='Course')
+        gateway = PaymentGateway.objects.create(name='paystack', display_name='Paystack')
+        self.payment = Payment.objects.create(
+            user=self.student, gateway=gateway, course=self.course, amount=Decimal('10.00'),
+            gateway_fee=Decimal('0'), platform_fee=Decimal('0')
+        )
+        self.enrollment = CourseEnrollment.objects.create(user=self.student, course=self.course)
+        expired = timezone.now() - timedelta(hours=48)
+        Payment.objects.filter(pk=self.payment.pk).update(initiated_at=expired)
+        CourseEnrollment.objects.filter(pk=self.enrollment.pk).update(enrolled_at=expired)
+
+    def test_expires_pending_payments_and_enrollments(self):
+        out = StringIO()
+        call_command('cleanup_expired_payments', stdout=out)
+        self.assertIn('Cleaned up 1 expired payments and 1 enrollments', out.getvalue())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'cancelled')
+        self.assertFalse(CourseEnrollment.objects.filter(pk=self.enrollment.pk).exists())
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('cleanup_expired_payments', dry_run=True, stdout=out)
+        self.assertIn('Would expire 1 payments', out.getvalue())
+        self.assertIn('Would cancel 1 enrollments', out.getvalue())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+
+class PaymentGatewayDefaultTests(TestCase):
+    def setUp(self):
+        self.paystack = PaymentGateway.objects.create(name='paystack', display_name='Paystack', is_default=True)
+
+    def test_new_default_unsets_previous_default(self):
+        PaymentGateway.objects.create(name='flutterwave', display_name='Flutterwave', is_default=True)
+        self.paystack.refresh_from_db()
+        self.assertFalse(self.paystack.is_default)
+
+    def test_resaving_default_skips_unset_update(self):
+        gateway = PaymentGateway.objects.get(pk=self.paystack.pk)
+        gateway.display_name = 'Paystack NG'
+        with CaptureQueriesContext(connection) as queries:
+            gateway.save()
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_stale_default_instance_unsets_newer_default(self):
+        stale = PaymentGateway.objects.get(pk=self.paystack.pk)
+        PaymentGateway.objects.create(name='flutterwave', display_name='Flutterwave', is_default=True)
+        stale.save()
+        self.assertEqual(
+            list(PaymentGateway.objects.filter(is_default=True).values_list('name', flat=True)),
+            ['paystack']
+        )
+
+    def test_default_set_on_loaded_gateway_unsets_others(self):
+        flutterwave = PaymentGateway.objects.create(name='flutterwave', display_name='Flutterwave')
+        flutterwave = PaymentGateway.objects.get(pk=flutterwave.pk)
+        flutterwave.is_default = True
+        flutterwave.save()
+        self.assertEqual(
+            list(PaymentGateway.objects.filter(is_default=True).values_list('name', flat=True)),
+            ['flutterwave']
+        )
+
+
+@override_settings(PAYSTACK_SECRET_KEY='test-secret')
+class PaystackWebhookTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.gateway = PaymentGateway.objects.create(name='paystack', display_name='Paystack')
+
+    def create_payment(self, gateway_reference):
+        return Payment.objects.create(
+            gateway=self.gateway, amount=Decimal('10.00'), customer_email='student@example.com',
+            gateway_fee=Decimal('0'), platform_fee=Decimal('0'), gateway_reference=gateway_reference
+        )
+
+    def post(self, payload):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(b'test-secret', body, hashlib.sha512).hexdigest()
+        request = self.factory.post(
+            '/api/webhooks/paystack', body, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature
+        )
+        response = webhook_views.paystack_webhook(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_duplicate_delivery_is_ignored(self):
+        payment = self.create_payment('PSK_REF')
+        payload = {'event': 'charge.success', 'data': {'id': 101, 'reference': 'PSK_REF'}}
+
+        self.assertEqual(self.post(payload), (200, {'status': 'success'}))
+        Payment.objects.filter(pk=payment.pk).update(status='pending')
+        self.assertEqual(self.post(payload), (200, {'status': 'duplicate'}))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+        webhook = PaymentWebhook.objects.get()
+        self.assertEqual(webhook.event_id, 'paystack:charge.success:101')
+        self.assertTrue(webhook.processed)
+
+    def test_charge_success_marks_payment_paid(self):
+        payment = self.create_payment('PAID_REF')
+        payload = {'event': 'charge.success', 'data': {'id': 103, 'reference': 'PAID_REF'}}
+
+        self.assertEqual(self.post(payload), (200, {'status': 'success'}))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        self.assertIsNotNone(payment.paid_at)
+        self.assertEqual(payment.metadata['paystack_webhook_data'], payload)
+
+    def test_failed_event_releases_claim_for_retry(self):
+        payload = {'event': 'charge.success', 'data': {'id': 102, 'reference': 'LATE_REF'}}
+
+        status_code, _ = self.post(payload)
+        self.assertEqual(status_code, 404)
+        self.assertFalse(PaymentWebhook.objects.exists())
+
+        payment = self.create_payment('LATE_REF')
+        self.assertEqual(self.post(payload), (200, {'status': 'success'}))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+    def test_crashed_delivery_is_retried(self):
+        payment = self.create_payment('CRASH_REF')
+        payload = {'event': 'charge.success', 'data': {'id': 104, 'reference': 'CRASH_REF'}}
+
+        with mock.patch.object(Payment, 'mark_as_paid', side_effect=RuntimeError('worker died')):
+            status_code, _ = self.post(payload)
+        self.assertEqual(status_code, 500)
+        self.assertFalse(PaymentWebhook.objects.exists())
+
+        self.assertEqual(self.post(payload), (200, {'status': 'success'}))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+    def test_null_data_is_ignored(self):
+        self.assertEqual(self.post({'event': 'subscription.create', 'data': None}), (200, {'status': 'ignored'}))
+        self.assertFalse(PaymentWebhook.objects.exists())
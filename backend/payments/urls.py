@@ -9,6 +9,9 @@ urlpatterns = [
     path('debug/', payment_views.debug_payment_endpoint, name='debug_payment_endpoint'),
     path('initialize/', payment_views.initialize_payment, name='initialize_payment'),
     path('verify/<str:reference>/', payment_views.verify_payment, name='verify_payment'),
-    path('overview/', payment_views.admin_payment_overview, name='admin_payment_overview'),
+    path('history/', payment_views.payment_history, name='payment_history'),
+    path('transactions/<uuid:payment_id>/', payment_views.payment_detail, name='payment_detail'),
+    path('gateways/', payment_views.get_payment_gateways, name='payment_gateways'),
+    path('admin/overview/', payment_views.admin_payment_overview, name='admin_payment_overview'),
     path('test-student-registration/', payment_views.test_student_registration_payment, name='test_student_registration_payment'),
-]
\ No newline at end of file
+]
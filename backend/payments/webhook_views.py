@@ -7,12 +7,53 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from .models import Payment, PaymentGateway
+from django.db import IntegrityError, transaction
+from .models import Payment, PaymentGateway, PaymentWebhook
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
+def _claim_webhook_event(gateway_name, event_id, event_type, reference, payload):
+    """
+    Record a webhook delivery keyed by the gateway's event id.
+    Returns False when the event was already recorded (a gateway retry).
+    Call it in the same transaction as the handler so a failed or
+    interrupted delivery rolls the claim back and the retry is processed.
+    """
+    if not event_id:
+        return True
+    
+    gateway = PaymentGateway.objects.filter(name=gateway_name).only('id').first()
+    if gateway is None:
+        return True
+    
+    try:
+        with transaction.atomic():
+            PaymentWebhook.objects.create(
+                gateway=gateway,
+                event_id=f"{gateway_name}:{event_id}",
+                event_type=event_type,
+                reference=reference or '',
+                payload=payload
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def _finish_webhook_event(gateway_name, event_id, response):
+    """Mark a claimed event processed, or release it so a retry is handled again"""
+    if not event_id:
+        return
+    
+    webhooks = PaymentWebhook.objects.filter(event_id=f"{gateway_name}:{event_id}")
+    if response.status_code >= 400:
+        webhooks.delete()
+    else:
+        webhooks.update(processed=True, success=True, processed_at=timezone.now())
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def paystack_webhook(request):
@@ -41,67 +82,83 @@ def paystack_webhook(request):
         
         logger.info(f"Paystack webhook received: {event}")
         
-        if event == 'charge.success':
-            # Handle successful payment
-            payment_data = data.get('data', {})
-            reference = payment_data.get('reference')
-            
-            try:
-                # Find payment by Paystack reference
-                payment = Payment.objects.get(gateway_reference=reference)
-                
-                # Update payment status
-                payment.status = 'completed'
-                payment.gateway_reference = payment_data.get('id', '')
-                payment.metadata = {
-                    **payment.metadata,
-                    'paystack_webhook_data': data,
-                    'webhook_processed_at': timezone.now().isoformat()
-                }
-                payment.completed_at = timezone.now()
-                payment.save()
-                
-                logger.info(f"Student registration payment {payment.reference} marked as completed via webhook")
-                
-                return JsonResponse({'status': 'success'})
-                
-            except Payment.DoesNotExist:
-                logger.error(f"Payment with Paystack reference {reference} not found")
-                return JsonResponse({'error': 'Payment not found'}, status=404)
+        payment_data = data.get('data') or {}
+        event_id = f"{event}:{payment_data['id']}" if payment_data.get('id') else ''
         
-        elif event == 'charge.failed':
-            # Handle failed payment
-            payment_data = data.get('data', {})
-            reference = payment_data.get('reference')
+        with transaction.atomic():
+            if not _claim_webhook_event('paystack', event_id, event, payment_data.get('reference'), data):
+                logger.info(f"Duplicate Paystack webhook ignored: {event_id}")
+                return JsonResponse({'status': 'duplicate'})
             
-            try:
-                payment = Payment.objects.get(gateway_reference=reference)
-                payment.status = 'failed'
-                payment.metadata = {
-                    **payment.metadata,
-                    'paystack_webhook_data': data,
-                    'webhook_processed_at': timezone.now().isoformat(),
-                    'failure_reason': payment_data.get('failure_reason', 'Unknown')
-                }
-                payment.save()
-                
-                logger.info(f"Student registration payment {payment.reference} marked as failed via webhook")
-                
-                return JsonResponse({'status': 'success'})
-                
-            except Payment.DoesNotExist:
-                logger.error(f"Payment with Paystack reference {reference} not found for failed charge")
-                return JsonResponse({'error': 'Payment not found'}, status=404)
-        
-        else:
-            logger.info(f"Ignoring webhook event: {event}")
-            return JsonResponse({'status': 'ignored'})
+            response = _handle_paystack_event(event, data)
+            _finish_webhook_event('paystack', event_id, response)
+        return response
             
     except Exception as e:
         logger.error(f"Webhook processing error: {str(e)}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
+def _handle_paystack_event(event, data):
+    """Apply a verified Paystack event to its payment"""
+    if event == 'charge.success':
+        # Handle successful payment
+        payment_data = data.get('data') or {}
+        reference = payment_data.get('reference')
+        
+        try:
+            # Find payment by Paystack reference
+            payment = Payment.objects.get(gateway_reference=reference)
+            
+            # Record the webhook, then complete through mark_as_paid so
+            # paid_at is set and the cached overview stats are dropped
+            payment.gateway_reference = payment_data.get('id', '')
+            payment.metadata = {
+                **payment.metadata,
+                'paystack_webhook_data': data,
+                'webhook_processed_at': timezone.now().isoformat()
+            }
+            with transaction.atomic():
+                payment.save(update_fields=['gateway_reference', 'metadata'])
+                payment.mark_as_paid()
+            
+            logger.info(f"Student registration payment {payment.reference} marked as completed via webhook")
+            
+            return JsonResponse({'status': 'success'})
+            
+        except Payment.DoesNotExist:
+            logger.error(f"Payment with Paystack reference {reference} not found")
+            return JsonResponse({'error': 'Payment not found'}, status=404)
+    
+    elif event == 'charge.failed':
+        # Handle failed payment
+        payment_data = data.get('data') or {}
+        reference = payment_data.get('reference')
+        
+        try:
+            payment = Payment.objects.get(gateway_reference=reference)
+            payment.status = 'failed'
+            payment.metadata = {
+                **payment.metadata,
+                'paystack_webhook_data': data,
+                'webhook_processed_at': timezone.now().isoformat(),
+                'failure_reason': payment_data.get('failure_reason', 'Unknown')
+            }
+            payment.save()
+            
+            logger.info(f"Student registration payment {payment.reference} marked as failed via webhook")
+            
+            return JsonResponse({'status': 'success'})
+            
+        except Payment.DoesNotExist:
+            logger.error(f"Payment with Paystack reference {reference} not found for failed charge")
+            return JsonResponse({'error': 'Payment not found'}, status=404)
+    
+    else:
+        logger.info(f"Ignoring webhook event: {event}")
+        return JsonResponse({'status': 'ignored'})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def flutterwave_webhook(request):
@@ -127,24 +184,39 @@ def flutterwave_webhook(request):
         status = data.get('status')
         tx_ref = data.get('tx_ref')
         
-        if status == 'successful':
-            # Handle successful payment
-            try:
-                payment = Payment.objects.get(reference=tx_ref)
-                payment.status = 'completed'
-                payment.gateway_reference = data.get('id', '')
-                payment.metadata = data
-                payment.save()
-                
-                logger.info(f"Payment {tx_ref} marked as completed")
-                return JsonResponse({'status': 'success'})
-                
-            except Payment.DoesNotExist:
-                logger.error(f"Payment with reference {tx_ref} not found")
-                return JsonResponse({'error': 'Payment not found'}, status=404)
+        event_id = f"{status}:{data['id']}" if data.get('id') else ''
         
-        return JsonResponse({'status': 'ignored'})
+        with transaction.atomic():
+            if not _claim_webhook_event('flutterwave', event_id, status or '', tx_ref, data):
+                logger.info(f"Duplicate Flutterwave webhook ignored: {event_id}")
+                return JsonResponse({'status': 'duplicate'})
+            
+            response = _handle_flutterwave_event(status, tx_ref, data)
+            _finish_webhook_event('flutterwave', event_id, response)
+        return response
         
     except Exception as e:
         logger.error(f"Flutterwave webhook error: {str(e)}")
-        return JsonResponse({'error': 'Internal error'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': 'Internal error'}, status=500)
+
+
+def _handle_flutterwave_event(status, tx_ref, data):
+    """Apply a verified Flutterwave event to its payment"""
+    if status == 'successful':
+        # Handle successful payment
+        try:
+            payment = Payment.objects.get(reference=tx_ref)
+            payment.gateway_reference = data.get('id', '')
+            payment.metadata = data
+            with transaction.atomic():
+                payment.save(update_fields=['gateway_reference', 'metadata'])
+                payment.mark_as_paid()
+            
+            logger.info(f"Payment {tx_ref} marked as completed")
+            return JsonResponse({'status': 'success'})
+            
+        except Payment.DoesNotExist:
+            logger.error(f"Payment with reference {tx_ref} not found")
+            return JsonResponse({'error': 'Payment not found'}, status=404)
+    
+    return JsonResponse({'status': 'ignored'})